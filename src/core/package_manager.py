@@ -1,145 +1,225 @@
+import os
 import subprocess
 import re
-from gi.repository import Gtk
-from utils.helpers import show_message_dialog, show_confirmation_dialog, get_package_icon
+import itertools
+import csv
+import io
+import concurrent.futures
+from utils.helpers import get_package_icon, mtime_cached
 from core.system import run_cmd, run_cmd_stream
 
+# Shared worker pool for running independent package manager queries concurrently
+_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+
+# Extracts Name, Version and Description from each `pacman -Qi` block in one pass
+_PACMAN_QI_RE = re.compile(r'^Name\s*:\s*(.+?)\nVersion\s*:\s*(.+?)\n(?:.*\n)*?Description\s*:\s*(.*?)$', re.M)
+
+# One line per name that `pacman -Q` could not resolve to an installed package
+_PACMAN_NOT_FOUND_RE = re.compile(r"^error: package '(.+?)' was not found$", re.M)
+
+# Header and description lines of a `pacman -Ss` result block
+_PAC_SEARCH_HEAD = re.compile(r'^(?:[a-z0-9-]+/)?(\S+) (\S+)(?: \(([^)]+)\))?$')
+_PAC_SEARCH_DESC = re.compile(r'^\s+(.*)$')
+
+def _gtk():
+    """Imports Gtk on first use, so dialog-free code paths never load it."""
+    from gi.repository import Gtk
+    return Gtk
+
 # --- Core Package Management Functions (for initial check) ---
+_CANDIDATES = ('apt', 'yum', 'dnf', 'pacman')
+_UNSET = object()
+_PKG_MANAGER = _UNSET
+
+def _is_on_path(name, path_dirs=None):
+    """Returns True if an executable called `name` exists in one of the PATH directories."""
+    if path_dirs is None:
+        path_dirs = os.environ.get("PATH", "").split(os.pathsep)
+    for d in path_dirs:
+        p = os.path.join(d, name)
+        if os.access(p, os.X_OK) and not os.path.isdir(p):
+            return True
+    return False
+
 def get_package_manager():
     """
     Detects the system's package manager.
     Returns 'apt', 'yum', 'dnf', 'pacman', or None if none is found.
+    Scans PATH directly instead of spawning `which`, and caches the result.
     """
-    try:
-        subprocess.run(['which', 'apt'], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        return 'apt'
-    except subprocess.CalledProcessError:
-        pass
+    global _PKG_MANAGER
+    if _PKG_MANAGER is not _UNSET:
+        return _PKG_MANAGER
 
-    try:
-        subprocess.run(['which', 'yum'], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        return 'yum'
-    except subprocess.CalledProcessError:
-        pass
-
-    try:
-        subprocess.run(['which', 'dnf'], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        return 'dnf'
-    except subprocess.CalledProcessError:
-        pass
-
-    try:
-        subprocess.run(['which', 'pacman'], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        return 'pacman'
-    except subprocess.CalledProcessError:
-        pass
+    path_dirs = os.environ.get("PATH", "").split(os.pathsep)
+    _PKG_MANAGER = None
+    for name in _CANDIDATES:
+        if _is_on_path(name, path_dirs):
+            _PKG_MANAGER = name
+            return _PKG_MANAGER
+    return _PKG_MANAGER
 
-    return None
-
-def check_package_installed(package_name, pkg_manager):
+def check_packages_installed(package_names, pkg_manager):
     """
-    Checks if a given package is installed based on the detected package manager.
-    Returns True if installed, False otherwise.
+    Checks several packages with a single package manager invocation.
+    Returns the set of package names that are not installed.
     """
-    print(f"Checking for package: {package_name}...") # Print to console for detailed log
-    if pkg_manager == 'apt':
-        try:
-            result = subprocess.run(['dpkg', '-s', package_name], capture_output=True, text=True)
-            return result.returncode == 0 and "install ok installed" in result.stdout.lower()
-        except FileNotFoundError:
-            show_message_dialog(f"Error: dpkg command not found. Is this an apt-based system?", Gtk.MessageType.ERROR)
-            return False
-    elif pkg_manager == 'yum' or pkg_manager == 'dnf':
-        try:
-            result = subprocess.run(['rpm', '-q', package_name], capture_output=True, text=True)
-            return result.returncode == 0
-        except FileNotFoundError:
-            show_message_dialog(f"Error: rpm command not found. Is this an rpm-based system?", Gtk.MessageType.ERROR)
-            return False
-    elif pkg_manager == 'pacman':
-        try:
-            result = subprocess.run(['pacman', '-Q', package_name], capture_output=True, text=True)
-            return result.returncode == 0
-        except FileNotFoundError:
-            show_message_dialog(f"Error: pacman command not found. Is this an Arch-based system?", Gtk.MessageType.ERROR)
-            return False
-    else:
-        show_message_dialog(f"Warning: Cannot check package '{package_name}'. Unknown package manager.", Gtk.MessageType.WARNING)
-        return False
+    from utils.dialogs import show_message_dialog
+    names = list(package_names)
+    if not names:
+        return set()
+    print(f"Checking for packages: {', '.join(names)}...")
+    try:
+        if pkg_manager == 'apt':
+            result = subprocess.run(['dpkg-query', '-W', '-f=${Package}\t${Status}\n', *names], capture_output=True, text=True)
+            installed = set()
+            for line in result.stdout.splitlines():
+                name, _, status = line.partition('\t')
+                if "install ok installed" in status.lower():
+                    installed.add(name)
+            return {n for n in names if n not in installed}
+        elif pkg_manager == 'yum' or pkg_manager == 'dnf':
+            # LC_ALL=C keeps the "is not installed" text unlocalized
+            result = subprocess.run(['rpm', '-q', *names], capture_output=True, text=True,
+                                    env={**os.environ, 'LC_ALL': 'C'})
+            output = result.stdout + result.stderr
+            missing = {n for n in names if f"package {n} is not installed" in output}
+            if result.returncode != 0 and not missing:
+                # Failed for some other reason; assume nothing is installed rather than everything
+                return set(names)
+            return missing
+        elif pkg_manager == 'pacman':
+            # Judge by stderr: stdout names the package that satisfied the query, which may
+            # be a provider (e.g. python-gobject-git for python-gobject). LC_ALL=C keeps the
+            # error text unlocalized.
+            result = subprocess.run(['pacman', '-Q', *names], capture_output=True, text=True,
+                                    env={**os.environ, 'LC_ALL': 'C'})
+            missing = {m[1] for m in _PACMAN_NOT_FOUND_RE.finditer(result.stderr)}
+            if result.returncode != 0 and not missing:
+                # Failed for some other reason; assume nothing is installed rather than everything
+                return set(names)
+            return missing
+        else:
+            show_message_dialog(f"Warning: Cannot check packages. Unknown package manager.", _gtk().MessageType.WARNING)
+            return set(names)
+    except FileNotFoundError:
+        show_message_dialog(f"Error: package query command for '{pkg_manager}' not found.", _gtk().MessageType.ERROR)
+        return set(names)
 
-def perform_initial_package_install(package_name, pkg_manager):
+def perform_initial_package_install_batch(package_names, pkg_manager):
     """
-    Prompts the user to install a package using GTK dialogs and executes the installation command if confirmed.
+    Prompts the user to install the missing packages using GTK dialogs and, if confirmed,
+    installs them all in a single package manager transaction.
     This is for the initial, one-time check.
     """
+    from utils.dialogs import show_message_dialog, show_confirmation_dialog
+    names = list(package_names)
+    names_str = ", ".join(names)
     if pkg_manager is None:
-        show_message_dialog(f"Cannot install '{package_name}': No supported package manager found.", Gtk.MessageType.ERROR)
+        show_message_dialog(f"Cannot install '{names_str}': No supported package manager found.", _gtk().MessageType.ERROR)
         return False
 
-    if show_confirmation_dialog(f"Package '{package_name}' is not installed.\nDo you want to install '{package_name}' using {pkg_manager}?"):
+    if show_confirmation_dialog(f"The following packages are not installed:\n{names_str}\nDo you want to install them using {pkg_manager}?"):
         install_command = []
         # Using pkexec for privileged operations
         if pkg_manager == 'apt':
-            install_command = ['pkexec', pkg_manager, 'install', '-y', package_name]
+            install_command = ['pkexec', pkg_manager, 'install', '-y', *names]
         elif pkg_manager == 'yum' or pkg_manager == 'dnf':
-            install_command = ['pkexec', pkg_manager, 'install', '-y', package_name]
+            install_command = ['pkexec', pkg_manager, 'install', '-y', *names]
         elif pkg_manager == 'pacman':
-            install_command = ['pkexec', pkg_manager, '-S', '--noconfirm', package_name]
+            install_command = ['pkexec', pkg_manager, '-S', '--noconfirm', *names]
         else:
-            show_message_dialog(f"Error: Installation for '{pkg_manager}' is not implemented.", Gtk.MessageType.ERROR)
+            show_message_dialog(f"Error: Installation for '{pkg_manager}' is not implemented.", _gtk().MessageType.ERROR)
             return False
 
-        show_message_dialog(f"Attempting to install: {' '.join(install_command)}\n(You may be prompted for authentication.)", Gtk.MessageType.INFO)
+        show_message_dialog(f"Attempting to install: {' '.join(install_command)}\n(You may be prompted for authentication.)", _gtk().MessageType.INFO)
 
         try:
             # Execute the installation command. User will be prompted for authentication.
             process = subprocess.run(install_command, check=True, text=True, capture_output=False)
-            show_message_dialog(f"Package '{package_name}' installed successfully.", Gtk.MessageType.INFO)
+            show_message_dialog(f"Packages '{names_str}' installed successfully.", _gtk().MessageType.INFO)
             return True
         except subprocess.CalledProcessError as e:
-            show_message_dialog(f"Error installing '{package_name}': {e}\nCheck terminal for details.", Gtk.MessageType.ERROR)
+            show_message_dialog(f"Error installing '{names_str}': {e}\nCheck terminal for details.", _gtk().MessageType.ERROR)
             print(f"STDOUT: {e.stdout}") # Still print to console for debugging
             print(f"STDERR: {e.stderr}")
             return False
         except FileNotFoundError:
-            show_message_dialog("Error: pkexec or package manager command not found.", Gtk.MessageType.ERROR)
+            show_message_dialog("Error: pkexec or package manager command not found.", _gtk().MessageType.ERROR)
             return False
     else:
-        show_message_dialog(f"Skipping installation of '{package_name}'.", Gtk.MessageType.INFO)
+        show_message_dialog(f"Skipping installation of '{names_str}'.", _gtk().MessageType.INFO)
         return False
 
 # --- Data Fetching Functions for App Store ---
+@mtime_cached('/var/lib/pacman/local')
 def get_installed_packages():
     """
     Fetches a list of installed Pacman packages.
     Adds a source and mock icon to each package.
+    Uses `expac` when available to query exactly the needed columns.
     """
+    if _is_on_path('expac'):
+        expac_output = run_cmd(['expac', '-Q', '%n\t%v\t%d'])
+        if not expac_output.startswith("Error:"):
+            pkgs = []
+            for line in expac_output.splitlines():
+                parts = line.split('\t', 2)
+                if len(parts) == 3:
+                    pkgs.append({
+                        'name': parts[0],
+                        'version': parts[1],
+                        'description': parts[2],
+                        'source': 'pacman',
+                        'icon': get_package_icon(parts[0])
+                    })
+            return pkgs
+        print(f"Warning: {expac_output}")
+
     pacman_output = run_cmd(['pacman', '-Qi']) 
-    pkgs = []
     if pacman_output.startswith("Error:"):
         print(f"Warning: {pacman_output}")
         return []
     
-    blocks = pacman_output.split('\n\n')
-    for block in blocks:
-        pkg = {}
-        for line in block.splitlines():
-            if ': ' in line:
-                key, value = line.split(': ', 1)
-                key = key.strip()
-                value = value.strip()
-                if key == 'Name':
-                    pkg['name'] = value
-                elif key == 'Version':
-                    pkg['version'] = value
-                elif key == 'Description':
-                    pkg['description'] = value
-        if pkg.get('name'):
-            pkg['source'] = 'pacman'
-            pkg['icon'] = get_package_icon(pkg['name'])
-            pkgs.append(pkg)
-    return pkgs
+    return [{
+        'name': m[1],
+        'version': m[2],
+        'description': m[3].strip(),
+        'source': 'pacman',
+        'icon': get_package_icon(m[1])
+    } for m in _PACMAN_QI_RE.finditer(pacman_output)]
 
+def get_package_details(pkg_name):
+    """
+    Fetches the full `pacman -Qi` record for a single installed package, on demand
+    when its detail view opens. Returns a dict of all fields, or None if not installed.
+    """
+    pacman_output = run_cmd(['pacman', '-Qi', pkg_name])
+    if pacman_output.startswith("Error:"):
+        print(f"Warning: {pacman_output}")
+        return None
+
+    details = {}
+    key = None
+    for line in pacman_output.splitlines():
+        if line and not line[0].isspace() and ':' in line:
+            key, _, value = line.partition(':')
+            key = key.strip()
+            details[key] = value.strip()
+        elif key:
+            # Continuation of a wrapped multi-line field
+            details[key] = f"{details[key]} {line.strip()}"
+    return details
+
+def _flatpak_rows(flatpak_output):
+    """
+    Splits tab-separated `flatpak --columns=...` output into rows of fields.
+    Quoting is disabled, since flatpak does not quote and descriptions may contain quotes.
+    """
+    return (row for row in csv.reader(io.StringIO(flatpak_output), delimiter='\t', quoting=csv.QUOTE_NONE) if row)
+
+# Flatpak touches the `.changed` file of an installation on every install, update and removal
+@mtime_cached('~/.local/share/flatpak/.changed', '/var/lib/flatpak/.changed')
 def get_flatpak_installed():
     """
     Fetches a list of installed Flatpak applications.
@@ -151,8 +231,7 @@ def get_flatpak_installed():
         print(f"Warning: {flatpak_output}")
         return []
     
-    for line in flatpak_output.splitlines():
-        parts = line.split('\t')
+    for parts in _flatpak_rows(flatpak_output):
         if len(parts) == 3:
             name = parts[0]
             version = parts[1]
@@ -169,6 +248,45 @@ def get_flatpak_installed():
             })
     return pkgs
 
+# `.changed` catches local installs, updates and removals (including the store's own); remote
+# update state changes without touching either, so entries also expire after a few minutes
+@mtime_cached('~/.local/share/flatpak/.changed', '/var/lib/flatpak/.changed',
+              '~/.local/share/flatpak/repo', '/var/lib/flatpak/repo', ttl=300)
+def _query_flatpak_updates():
+    """
+    Lists Flatpak applications with updates available, without starting a transaction.
+    Returns None if flatpak failed (e.g. offline), so the failure is not cached.
+    """
+    flatpak_out = run_cmd(['flatpak', 'remote-ls', '--updates', '--app', '--columns=application,version,branch'])
+    updates = []
+    if flatpak_out.startswith("Error:"):
+        print(f"Warning: {flatpak_out}")
+        return None
+
+    for parts in _flatpak_rows(flatpak_out):
+        if parts[0].lower() == 'application':
+            continue
+        if len(parts) >= 2:
+            raw_name = parts[0].strip()
+            new_version = parts[1].strip()
+            display_name = raw_name.split('.')[-1] if '.' in raw_name else raw_name
+            updates.append({
+                'name': display_name,
+                'raw_name': raw_name,
+                'version': new_version,
+                'description': f"Update available to {new_version}" if new_version else "Update available",
+                'source': 'flatpak',
+                'icon': get_package_icon(display_name)
+            })
+    return updates
+
+def get_flatpak_updates():
+    """
+    Lists Flatpak applications with updates available.
+    Adds a source and mock icon to each package.
+    """
+    return _query_flatpak_updates() or []
+
 def get_updates():
     """
     Checks for available Pacman and Flatpak updates.
@@ -176,7 +294,10 @@ def get_updates():
     """
     updates = []
 
-    pacman_out = run_cmd(['pacman', '-Qu']) 
+    pacman_future = _EXECUTOR.submit(run_cmd, ['pacman', '-Qu'])
+    flatpak_future = _EXECUTOR.submit(get_flatpak_updates)
+
+    pacman_out = pacman_future.result()
     if pacman_out and not pacman_out.startswith("Error:"):
         for line in pacman_out.splitlines():
             parts = line.split()
@@ -191,27 +312,7 @@ def get_updates():
                     'icon': get_package_icon(name)
                 })
     
-    flatpak_out = run_cmd(['flatpak', 'update', '--app', '--assumeno']) 
-    if flatpak_out and not flatpak_out.startswith("Error:"):
-        lines = flatpak_out.splitlines()
-        for line in lines:
-            if "Total:" in line or "Nothing to do" in line or "Skipping" in line:
-                continue
-            match = re.match(r'  ([a-zA-Z0-9\._-]+)\s+stable\s+([0-9\.]+)\s+([0-9\.]+)\s+.*', line)
-            if match:
-                raw_name = match.group(1)
-                current_version = match.group(2)
-                new_version = match.group(3)
-                display_name = raw_name.split('.')[-1] if '.' in raw_name else raw_name
-                updates.append({
-                    'name': display_name,
-                    'raw_name': raw_name,
-                    'version': new_version,
-                    'description': f"Update available from {current_version} to {new_version}",
-                    'source': 'flatpak',
-                    'icon': get_package_icon(display_name)
-                })
-    
+    updates.extend(flatpak_future.result())
     return updates
 
 def search_pacman_repo(term):
@@ -224,19 +325,19 @@ def search_pacman_repo(term):
         print(f"Warning: {pacman_search_output}")
         return []
 
-    package_blocks = re.split(r'\n\n', pacman_search_output)
+    package_blocks = pacman_search_output.split('\n\n')
     for block in package_blocks:
         lines = block.splitlines()
         if not lines:
             continue
 
-        first_line_match = re.match(r'^(?:[a-z0-9-]+/)?([^ ]+) ([^ ]+)(?: \(([^)]+)\))?$', lines[0].strip())
+        first_line_match = _PAC_SEARCH_HEAD.match(lines[0].strip())
         if first_line_match:
             name = first_line_match.group(1)
             version = first_line_match.group(2)
             description = ""
             if len(lines) > 1:
-                desc_match = re.match(r'^\s+(.*)$', lines[1])
+                desc_match = _PAC_SEARCH_DESC.match(lines[1])
                 if desc_match:
                     description = desc_match.group(1).strip()
             
@@ -259,10 +360,9 @@ def search_flatpak_repo(term):
         print(f"Warning: {flatpak_search_output}")
         return []
     
-    for line in flatpak_search_output.splitlines():
-        if line.lower().startswith('application\t'):
+    for parts in _flatpak_rows(flatpak_search_output):
+        if parts[0].lower() == 'application':
             continue
-        parts = line.split('\t')
         if len(parts) >= 3:
             raw_name = parts[0].strip()
             version = parts[1].strip()
@@ -334,24 +434,29 @@ def search_packages(term, search_scope='installed'):
     """
     term = term.lower()
     
-    all_packages = []
     if search_scope == 'installed':
-        all_packages = get_installed_packages() + get_flatpak_installed()
+        pacman_future = _EXECUTOR.submit(get_installed_packages)
+        flatpak_future = _EXECUTOR.submit(get_flatpak_installed)
+        return [p for p in itertools.chain(pacman_future.result(), flatpak_future.result())
+                if term in p['name'].lower() or term in p['description'].lower()]
     elif search_scope == 'explore':
-        all_packages.extend(search_pacman_repo(term))
-        all_packages.extend(search_flatpak_repo(term))
-        # Remove duplicates based on name if they come from different sources
-        unique_packages = {p['name']: p for p in all_packages}
-        all_packages = list(unique_packages.values())
+        pacman_future = _EXECUTOR.submit(search_pacman_repo, term)
+        flatpak_future = _EXECUTOR.submit(search_flatpak_repo, term)
+        # Filter and remove duplicates based on name (later sources win) in a single pass
+        unique_packages = {}
+        for p in itertools.chain(pacman_future.result(), flatpak_future.result()):
+            if term in p['name'].lower() or term in p['description'].lower():
+                unique_packages[p['name']] = p
+        return list(unique_packages.values())
     else:
         return []
 
-    results = [p for p in all_packages if term in p['name'].lower() or term in p['description'].lower()]
-    return results
-
 # --- Package Installation/Uninstallation for App Store (streaming progress) ---
 def install_package_app_store(pkg_data, send_js_callback):
-    """Installs a package using the specified source, reporting progress to JS."""
+    """
+    Installs a package using the specified source, reporting progress to JS.
+    Returns a dict {'ok': bool, 'message': str}.
+    """
     pkg_name = pkg_data.get('name')
     source = pkg_data.get('source')
     raw_name = pkg_data.get('raw_name') # For Flatpak
@@ -369,11 +474,14 @@ def install_package_app_store(pkg_data, send_js_callback):
         # Flatpak install -y flathub ... might ask for password if installing system-wide.
         result = run_cmd_stream(['flatpak', 'install', '-y', 'flathub', target_pkg_id], target_pkg_id, 'install', pkg_name, send_js_callback)
     else:
-        result = f"Error: Unknown source '{source}' for install."
+        result = {'ok': False, 'message': f"Error: Unknown source '{source}' for install."}
     return result
 
 def uninstall_package_app_store(pkg_data, send_js_callback):
-    """Uninstalls a package using the specified source, reporting progress to JS."""
+    """
+    Uninstalls a package using the specified source, reporting progress to JS.
+    Returns a dict {'ok': bool, 'message': str}.
+    """
     pkg_name = pkg_data.get('name')
     source = pkg_data.get('source')
     raw_name = pkg_data.get('raw_name') # For Flatpak
@@ -387,5 +495,5 @@ def uninstall_package_app_store(pkg_data, send_js_callback):
     elif source == 'flatpak':
         result = run_cmd_stream(['flatpak', 'uninstall', '-y', target_pkg_id], target_pkg_id, 'uninstall', pkg_name, send_js_callback)
     else:
-        result = f"Error: Unknown source '{source}' for uninstall."
+        result = {'ok': False, 'message': f"Error: Unknown source '{source}' for uninstall."}
     return result
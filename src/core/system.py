@@ -1,6 +1,26 @@
+import os
 import subprocess
 import re
-from gi.repository import GLib
+import time
+import selectors
+import threading
+
+# Progress patterns matched against every (raw bytes) line of streamed output
+_PACMAN_ITEM_RE = re.compile(rb'\((\d+)/(\d+)\)')
+_PCT_RE = re.compile(rb'(\d+)%')
+_STATUS_RE = re.compile(rb'downloading|installing|verifying|finishing')
+_STATUS_MAP = {
+    b'downloading': "Downloading...",
+    b'installing': "Installing...",
+    b'verifying': "Verifying...",
+    b'finishing': "Finishing...",
+}
+
+# Minimum seconds between progress updates sent to the UI (~30 per second)
+_PROGRESS_INTERVAL = 0.033
+
+# Line breaks in streamed output; progress bars redraw in place with a bare \r
+_LINE_SPLIT_RE = re.compile(rb'\r\n|\r|\n')
 
 def run_cmd(cmd):
     """
@@ -20,139 +40,188 @@ def run_cmd(cmd):
     except Exception as e:
         return f"An unexpected error occurred while running command {cmd[0]}: {str(e)}"
 
+def _iter_output_lines(process, stderr_lines):
+    """
+    Yields raw byte lines from both stdout and stderr of `process` as soon as either is
+    readable, so neither pipe can fill up and block the child. Like universal newlines,
+    \r, \n and \r\n all end a line. Lines read from stderr are also appended, decoded,
+    to `stderr_lines`.
+    """
+    sel = selectors.DefaultSelector()
+    buffers = {}
+    for stream in (process.stdout, process.stderr):
+        sel.register(stream.fileno(), selectors.EVENT_READ)
+        buffers[stream.fileno()] = b''
+    stderr_fd = process.stderr.fileno()
+    try:
+        while sel.get_map():
+            for key, _ in sel.select(timeout=0.05):
+                fd = key.fd
+                chunk = os.read(fd, 4096)
+                if chunk:
+                    *lines, buffers[fd] = _LINE_SPLIT_RE.split(buffers[fd] + chunk)
+                else:
+                    # EOF: flush whatever is left without a trailing newline
+                    sel.unregister(fd)
+                    lines = [buffers[fd]] if buffers[fd] else []
+                    buffers[fd] = b''
+                for line in lines:
+                    if fd == stderr_fd:
+                        stderr_lines.append(line.decode('utf-8', 'replace'))
+                    yield line
+    finally:
+        sel.close()
+
 def run_cmd_stream(cmd, pkg_id, command_type, pkg_name, send_js_callback):
     """
     Executes a shell command, streams its output, and sends progress updates
     to the JavaScript frontend via a callback.
+    The callback is called from worker threads and must be thread-safe; every update
+    has been passed to it by the time this returns.
+    Returns a dict {'ok': bool, 'message': str}.
     """
     try:
         print(f"DEBUG: Attempting to run streaming command: {cmd} for {pkg_name} ({command_type})")
         
+        # Keep the child setup plain (no preexec_fn, user/group or session changes)
+        # so CPython spawns via vfork() instead of copying this process's memory.
         process = subprocess.Popen(
             cmd,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1, # Line-buffered
-            universal_newlines=True
+            close_fds=True # The default, kept deliberately: the GUI's descriptors must not leak into pkexec
         )
 
         progress = 0
         status = "Starting..."
+        last_push = 0.0
+        pending = None
+        flush_timer = None
+        lock = threading.Lock()
 
-        GLib.idle_add(send_js_callback, {
-            'response': 'operationProgress',
-            'id': pkg_id,
-            'name': pkg_name,
-            'command': command_type,
-            'status': status,
-            'progress': progress
-        })
-
-        # Read stdout line by line for progress
-        for line in iter(process.stdout.readline, ''):
+        def send(payload):
+            """
+            Passes a payload to send_js_callback and records when it went out. Caller holds lock.
+            The callback must be thread-safe; calling it directly keeps progress in order with
+            whatever the caller queues after this function returns.
+            """
+            nonlocal last_push, pending
+            send_js_callback(payload)
+            last_push = time.monotonic()
+            pending = None
+
+        def flush_pending():
+            """Trailing edge: sends an update that was held back because it arrived too soon."""
+            nonlocal flush_timer
+            with lock:
+                flush_timer = None
+                if pending is not None:
+                    send(pending)
+
+        def push(status, progress, force=False):
+            """Sends a progress update, coalescing updates that arrive faster than the UI frame rate."""
+            nonlocal pending, flush_timer
+            payload = {
+                'response': 'operationProgress',
+                'id': pkg_id,
+                'name': pkg_name,
+                'command': command_type,
+                'status': status,
+                'progress': progress
+            }
+            with lock:
+                if force or time.monotonic() - last_push >= _PROGRESS_INTERVAL:
+                    send(payload)
+                    return
+                pending = payload
+                if flush_timer is None:
+                    flush_timer = threading.Timer(_PROGRESS_INTERVAL, flush_pending)
+                    flush_timer.daemon = True
+                    flush_timer.start()
+
+        push(status, progress, force=True)
+
+        stderr_lines = []
+
+        # Read stdout and stderr line by line for progress
+        for line in _iter_output_lines(process, stderr_lines):
             line = line.strip()
+            low = line.lower() # ASCII-only lowercasing of the raw bytes
             # print(f"STDOUT for {pkg_name}: {line}") # Keep this for debugging if needed
 
             # --- Progress Parsing Logic ---
             # Pacman download progress (e.g., ":: Downloading foo-bar 1.0.0-1 (50/100) ...")
-            pacman_dl_match = re.search(r'\((\d+)/(\d+)\)', line)
+            pacman_dl_match = _PACMAN_ITEM_RE.search(line)
             if pacman_dl_match:
                 current_item = int(pacman_dl_match.group(1))
                 total_items = int(pacman_dl_match.group(2))
                 if total_items > 0:
                     progress = (current_item / total_items) * 100
                     status = f"Downloading item {current_item} of {total_items}"
-                    GLib.idle_add(send_js_callback, {
-                        'response': 'operationProgress',
-                        'id': pkg_id,
-                        'name': pkg_name,
-                        'command': command_type,
-                        'status': status,
-                        'progress': progress
-                    })
+                    push(status, progress, force=progress >= 100)
                     continue
 
             # Flatpak download/install progress (less standardized, often just "downloading", "installing")
-            if "downloading" in line.lower():
-                status = "Downloading..."
-            elif "installing" in line.lower():
-                status = "Installing..."
-            elif "verifying" in line.lower():
-                status = "Verifying..."
-            elif "finishing" in line.lower():
-                status = "Finishing..."
+            status_match = _STATUS_RE.search(low)
+            if status_match:
+                status = _STATUS_MAP[status_match.group()]
             
             # More generic percentage detection
-            percent_match = re.search(r'(\d+)%', line)
+            percent_match = _PCT_RE.search(line)
             if percent_match:
                 new_progress = int(percent_match.group(1))
                 # Only update if progress increases or if it's the first percentage
                 if new_progress >= progress: 
                     progress = new_progress
-                    GLib.idle_add(send_js_callback, {
-                        'response': 'operationProgress',
-                        'id': pkg_id,
-                        'name': pkg_name,
-                        'command': command_type,
-                        'status': status,
-                        'progress': progress
-                    })
+                    push(status, progress, force=progress >= 100)
                     continue 
 
             # Send general status updates if no specific progress was parsed
-            if "error" in line.lower() or "failed" in line.lower():
-                status = f"Error: {line}"
-                GLib.idle_add(send_js_callback, {
-                    'response': 'operationProgress',
-                    'id': pkg_id,
-                    'name': pkg_name,
-                    'command': command_type,
-                    'status': status,
-                    'progress': progress
-                })
-            elif "warning" in line.lower():
-                status = f"Warning: {line}"
+            if b"error" in low or b"failed" in low:
+                status = f"Error: {line.decode('utf-8', 'replace')}"
+                push(status, progress, force=True)
+            elif b"warning" in low:
+                status = f"Warning: {line.decode('utf-8', 'replace')}"
             elif line: 
-                status = line
-                GLib.idle_add(send_js_callback, {
-                    'response': 'operationProgress',
-                    'id': pkg_id,
-                    'name': pkg_name,
-                    'command': command_type,
-                    'status': status,
-                    'progress': progress
-                })
+                status = line.decode('utf-8', 'replace')
+                push(status, progress)
         
-        # Ensure final state is reported
-        if progress < 100 and "Error:" not in status:
-            progress = 100 
-            status = "Completed"
-            GLib.idle_add(send_js_callback, {
-                'response': 'operationProgress',
-                'id': pkg_id,
-                'name': pkg_name,
-                'command': command_type,
-                'status': status,
-                'progress': progress
-            })
+        # Deliver any held-back update before the final state
+        with lock:
+            if flush_timer is not None:
+                flush_timer.cancel()
+                flush_timer = None
+            if pending is not None:
+                send(pending)
 
-        stdout_remaining, stderr = process.communicate()
-        if stdout_remaining: 
-            print(f"STDOUT (remaining) for {pkg_name}: {stdout_remaining.strip()}")
+        process.wait()
+        for stream in (process.stdout, process.stderr):
+            stream.close()
 
+        # Report the final state from the exit code; stderr lines mentioning "error" or
+        # "failed" may only be warnings (e.g. a mirror that failed to synchronize)
+        if process.returncode == 0:
+            push("Completed", 100, force=True)
+        else:
+            if not status.startswith("Error:"):
+                status = f"Error: exit code {process.returncode}"
+            push(status, progress, force=True)
+
+        stderr = "\n".join(stderr_lines)
         if stderr:
             print(f"STDERR for {pkg_name}: {stderr.strip()}")
 
         if process.returncode != 0:
-            return f"Error: Command failed with exit code {process.returncode}. Stderr: {stderr.strip() or 'No stderr'}"
-        return "Success"
+            return {'ok': False, 'message': f"Error: Command failed with exit code {process.returncode}. Stderr: {stderr.strip() or 'No stderr'}"}
+        return {'ok': True, 'message': "Success"}
 
     except FileNotFoundError:
-        return f"Error: Command '{cmd[0]}' not found. Make sure it's in your PATH."
+        return {'ok': False, 'message': f"Error: Command '{cmd[0]}' not found. Make sure it's in your PATH."}
     except subprocess.TimeoutExpired as e:
         process.kill()
         outs, errs = process.communicate()
-        return f"Error: Command '{cmd[0]}' timed out. Output: {outs.strip() if outs else ''} Error: {errs.strip() if errs else ''}"
+        outs = outs.decode('utf-8', 'replace').strip() if outs else ''
+        errs = errs.decode('utf-8', 'replace').strip() if errs else ''
+        return {'ok': False, 'message': f"Error: Command '{cmd[0]}' timed out. Output: {outs} Error: {errs}"}
     except Exception as e:
-        return f"An unexpected error occurred while running command {cmd[0]}: {str(e)}"
+        return {'ok': False, 'message': f"An unexpected error occurred while running command {cmd[0]}: {str(e)}"}
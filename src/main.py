@@ -15,19 +15,74 @@ except ValueError:
     sys.exit(1)
 
 from ui.window import AppStoreWindow
-from core.package_manager import get_package_manager, check_package_installed, perform_initial_package_install
-from utils.helpers import show_message_dialog
+from core.package_manager import get_package_manager, check_packages_installed, perform_initial_package_install_batch
+from utils.dialogs import show_message_dialog
 
 # Define a flag file path to mark that the initial check has been done
-INITIAL_CHECK_FLAG_FILE = os.path.join(os.path.expanduser("~"), ".linux_app_store_initial_check_done")
+STATE_DIR = os.path.join(os.environ.get("XDG_STATE_HOME") or os.path.join(os.path.expanduser("~"), ".local", "state"), "linux-software-store")
+INITIAL_CHECK_FLAG_FILE = os.path.join(STATE_DIR, "initial_check")
+# Bump this to make every user re-run the initial check (e.g. when the required package list changes)
+INITIAL_CHECK_VERSION = 1
+# Unversioned flag written by releases before the XDG state file; its presence counts as version 1
+LEGACY_INITIAL_CHECK_FLAG_FILE = os.path.join(os.path.expanduser("~"), ".linux_app_store_initial_check_done")
+
+_initial_check_done = False
+
+def is_initial_check_done():
+    """
+    Returns True if the flag file records the current INITIAL_CHECK_VERSION.
+    A legacy flag file is moved to the new location as version 1 on first read.
+    A positive result is cached for the rest of the process.
+    """
+    global _initial_check_done
+    if not _initial_check_done:
+        if not os.path.exists(INITIAL_CHECK_FLAG_FILE) and os.path.exists(LEGACY_INITIAL_CHECK_FLAG_FILE):
+            if _write_initial_check_flag(1):
+                try:
+                    os.remove(LEGACY_INITIAL_CHECK_FLAG_FILE)
+                except OSError:
+                    pass
+        try:
+            with open(INITIAL_CHECK_FLAG_FILE, 'r') as f:
+                _initial_check_done = int(f.read().strip() or 0) >= INITIAL_CHECK_VERSION
+        except (OSError, ValueError):
+            # Could not migrate (e.g. unwritable state dir); still honour the legacy flag
+            _initial_check_done = INITIAL_CHECK_VERSION <= 1 and os.path.exists(LEGACY_INITIAL_CHECK_FLAG_FILE)
+    return _initial_check_done
+
+def _write_initial_check_flag(version):
+    """
+    Writes `version` to the flag file. Returns True on success.
+    No fsync: losing the flag only means the check runs once more.
+    """
+    try:
+        os.makedirs(STATE_DIR, exist_ok=True)
+        fd = os.open(INITIAL_CHECK_FLAG_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.write(fd, f"{version}\n".encode())
+        finally:
+            os.close(fd)
+        return True
+    except OSError as e:
+        print(f"Warning: Could not create initial check flag file {INITIAL_CHECK_FLAG_FILE}: {e}")
+        return False
+
+def mark_initial_check_done():
+    """
+    Records INITIAL_CHECK_VERSION in the flag file.
+    """
+    global _initial_check_done
+    if _write_initial_check_flag(INITIAL_CHECK_VERSION):
+        _initial_check_done = True
+        print(f"Created flag file: {INITIAL_CHECK_FLAG_FILE}")
 
 def main_initial_check():
     """
     Performs the initial one-time package check and installation using GTK dialogs.
     Returns True if successful, False otherwise.
     """
-    # Check if the flag file exists. If it does, skip the initial check.
-    if os.path.exists(INITIAL_CHECK_FLAG_FILE):
+    # Check if the flag file records the current check version. If it does, skip the initial check.
+    if is_initial_check_done():
         print("Initial package check already performed. Skipping.")
         return True
 
@@ -47,40 +102,22 @@ def main_initial_check():
     else:
         show_message_dialog(f"Detected system package manager: {pkg_manager}", Gtk.MessageType.INFO)
 
-    missing_initial_packages = []
-    for package in required_initial_packages:
-        if not check_package_installed(package, pkg_manager):
-            missing_initial_packages.append(package)
+    missing = check_packages_installed(required_initial_packages, pkg_manager)
+    missing_initial_packages = [p for p in required_initial_packages if p in missing]
 
     if not missing_initial_packages:
         show_message_dialog("\nAll initial required packages are already installed. You're all set!", Gtk.MessageType.INFO)
         # Create the flag file as the initial check was successful
-        try:
-            with open(INITIAL_CHECK_FLAG_FILE, 'w') as f:
-                f.write('done')
-            print(f"Created flag file: {INITIAL_CHECK_FLAG_FILE}")
-        except IOError as e:
-            print(f"Warning: Could not create initial check flag file {INITIAL_CHECK_FLAG_FILE}: {e}")
+        mark_initial_check_done()
         return True 
     else:
         missing_list = "\n".join([f"- {p}" for p in missing_initial_packages])
         show_message_dialog(f"--- Missing Initial Packages Detected ---\n{missing_list}\n\nAttempting to install missing packages...", Gtk.MessageType.WARNING)
 
-        all_installed_initially = True
-        for package in missing_initial_packages:
-            if not perform_initial_package_install(package, pkg_manager):
-                all_installed_initially = False
-                break 
-
-        if all_installed_initially:
+        if perform_initial_package_install_batch(missing_initial_packages, pkg_manager):
             show_message_dialog("\n--- Initial Package Installation Finished Successfully ---", Gtk.MessageType.INFO)
             # Create the flag file as the initial check and installation was successful
-            try:
-                with open(INITIAL_CHECK_FLAG_FILE, 'w') as f:
-                    f.write('done')
-                print(f"Created flag file: {INITIAL_CHECK_FLAG_FILE}")
-            except IOError as e:
-                print(f"Warning: Could not create initial check flag file {INITIAL_CHECK_FLAG_FILE}: {e}")
+            mark_initial_check_done()
             return True
         else:
             show_message_dialog("\n--- Initial Package Installation Aborted or Failed. Exiting. ---", Gtk.MessageType.ERROR)
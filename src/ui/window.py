@@ -1,17 +1,62 @@
 import os
-import json
+import logging
+import time
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from gi.repository import Gtk, WebKit2, GLib
+from utils.helpers import json_dumps
 from core.package_manager import (
     get_installed_packages,
     get_flatpak_installed,
     get_updates,
     get_explore_packages,
+    get_package_details,
     search_packages,
     install_package_app_store,
     uninstall_package_app_store
 )
 
+logger = logging.getLogger(__name__)
+
+# src/ui/window.py -> src/ui/resources/index.html
+_HTML_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources", "index.html")
+
+def _js_call(func, obj):
+    """
+    Builds `func("<json>")`: the payload is serialized once and then encoded as a JSON
+    string literal (a valid JS string literal, unlike Python's repr), so WebKit only
+    compiles a trivial call and the page decodes the payload with JSON.parse.
+    """
+    return f'{func}({json_dumps(json_dumps(obj))});'
+
+def _js_prop(value, name, default=None):
+    """
+    Returns property `name` of a JS object (JSCValue) as a Python string,
+    or `default` if it is missing, null or undefined.
+    """
+    if value is None or not value.is_object() or not value.object_has_property(name):
+        return default
+    prop = value.object_get_property(name)
+    if prop.is_undefined() or prop.is_null():
+        return default
+    return prop.to_string()
+
+# Package fields sent for list views
+_PKG_COLUMNS = ('name', 'version', 'description', 'source', 'icon', 'raw_name')
+
+def _to_columns(rows):
+    """
+    Transposes a list of package dicts into a dict of per-field lists (struct of arrays),
+    which serializes as a handful of flat lists instead of one object per package.
+    """
+    return {key: [row.get(key) for row in rows] for key in _PKG_COLUMNS}
+
+# Batching window for JS flushes while messages keep arriving
+FLUSH_INTERVAL_MS = 10
+
+# Seconds the explore catalog is reused before being fetched again
+EXPLORE_CACHE_TTL = 60
+
 class AppStoreWindow(Gtk.Window):
     def __init__(self):
         super().__init__(title="Linux Mobile App Store")
@@ -25,6 +70,36 @@ class AppStoreWindow(Gtk.Window):
         self.context.register_script_message_handler("appstore")
         self.context.connect("script-message-received::appstore", self.on_js_message)
 
+        # Shared worker pool for long-running operations; caps concurrent package manager processes
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="appstore")
+        self.connect("destroy", lambda *_: self._executor.shutdown(wait=False))
+
+        # Messages for JS are queued and flushed together once per main loop idle tick
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._flush_scheduled = False
+        self._last_flush = 0.0
+        # Until the page has loaded, appstoreReceive does not exist; messages stay queued
+        self._js_ready = False
+        self.webview.connect("load-changed", self._on_load_changed)
+
+        self._explore_cache = (0.0, None) # (monotonic timestamp, data) of the last explore fetch
+
+        self._search_generation = 0 # Incremented per search so stale results can be dropped
+        self._search_future = None # Future of the latest search, cancelled if superseded before it starts
+
+        # JS command -> handler; see the _h_* methods below
+        self._handlers = {
+            'getInstalled': self._h_installed,
+            'getUpdates': self._h_updates,
+            'getExplorePackages': self._h_explore,
+            'getDetails': self._h_details,
+            'search': self._h_search,
+            'install': self._h_install_uninstall,
+            'uninstall': self._h_install_uninstall,
+            'log': self._h_log,
+        }
+
         self.load_ui()
         
     def load_ui(self):
@@ -33,22 +108,16 @@ class AppStoreWindow(Gtk.Window):
         Assumes 'index.html' is in the resources directory.
         """
         try:
-            # src/ui/window.py -> src/ui/resources/index.html
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            html_file_path = os.path.join(script_dir, "resources", "index.html")
-
-            if not os.path.exists(html_file_path):
-                print(f"Error: index.html not found at {html_file_path}")
-                # Fallback HTML for error display
-                self.webview.load_html("<h1>Error: index.html not found!</h1><p>Please ensure 'index.html' is in the correct directory.</p>", "file:///")
-                return
-
-            with open(html_file_path, "r", encoding="utf-8") as f:
-                html_content = f.read()
-            
-            self.webview.load_html(html_content, f"file://{html_file_path}") # Use file:/// for correct base URL
-            print(f"Loaded HTML from {html_file_path}")
+            if not os.path.isfile(_HTML_PATH):
+                raise FileNotFoundError(_HTML_PATH)
+            # Let WebKit read and parse the file itself instead of passing the markup through Python
+            self.webview.load_uri(GLib.filename_to_uri(_HTML_PATH, None))
+            logger.debug("Loaded HTML from %s", _HTML_PATH)
 
+        except FileNotFoundError:
+            print(f"Error: index.html not found at {_HTML_PATH}")
+            # Fallback HTML for error display
+            self.webview.load_html("<h1>Error: index.html not found!</h1><p>Please ensure 'index.html' is in the correct directory.</p>", "file:///")
         except Exception as e:
             print(f"Failed to load HTML: {e}")
             self.webview.load_html(f"<h1>Error loading UI: {e}</h1>", "file:///")
@@ -57,95 +126,182 @@ class AppStoreWindow(Gtk.Window):
     def on_js_message(self, user_content_manager, js_message):
         """
         Handles messages sent from JavaScript to the Python backend.
+        Messages are plain JS objects; fields are read straight from the JSCValue
+        instead of round-tripping the whole message through JSON.
         """
         message = js_message.get_js_value()
-        json_str = ""
         try:
-            json_str = message.to_string()
-            message_dict = json.loads(json_str)
-
-            command = message_dict.get('command')
-            print(f"DEBUG: Received JS command: {command}, raw message: {json_str}")
-
-            # Use GLib.idle_add for immediate responses back to JS on the main thread
-            # Use threading.Thread for long-running operations (like package installs)
-
-            if command == 'getInstalled':
-                # Fetching can be long, so run in thread for better responsiveness
-                threading.Thread(target=lambda: GLib.idle_add(
-                    self.send_to_js, {'response': 'installedPackages', 'data': get_installed_packages() + get_flatpak_installed()}
-                )).start()
-
-            elif command == 'getUpdates':
-                threading.Thread(target=lambda: GLib.idle_add(
-                    self.send_to_js, {'response': 'updatePackages', 'data': get_updates()}
-                )).start()
-
-            elif command == 'getExplorePackages':
-                threading.Thread(target=lambda: GLib.idle_add(
-                    self.send_to_js, {'response': 'explorePackages', 'data': get_explore_packages()}
-                )).start()
-                
-            elif command == 'search':
-                term = message_dict.get('term')
-                scope = message_dict.get('scope', 'installed')
-                threading.Thread(target=self.run_search, args=(term, scope)).start()
-
-            elif command == 'install' or command == 'uninstall':
-                pkg = message_dict.get('package')
-                is_install = (command == 'install')
-                threading.Thread(target=self.run_install_uninstall, args=(pkg, is_install)).start()
-            
-            elif command == 'log':
-                msg = message_dict.get('message')
-                print(f"JS LOG: {msg}")
+            command = _js_prop(message, 'command')
+            logger.debug("JS command: %s", command)
+
+            handler = self._handlers.get(command)
+            if handler:
+                handler(message)
                 
-        except json.JSONDecodeError as e:
-            print(f"Error decoding JSON message from JS: {e} - Message: {json_str}")
         except Exception as e:
             print(f"Unhandled error handling JS message: {e}")
 
-    def run_search(self, term, scope):
+    # --- JS command handlers ---
+    # Each receives the message JSCValue and runs on the main thread, so any fields are
+    # read here before work is handed off. Responses go back through _queue_to_js,
+    # which is flushed on the main thread; long-running work goes to the worker pool.
+
+    def _h_installed(self, message):
+        # Fetching can be long, so run pacman and flatpak in parallel workers
+        self._when_all_done(
+            [self._executor.submit(get_installed_packages), self._executor.submit(get_flatpak_installed)],
+            lambda results: self._queue_to_js({'response': 'installedPackages', 'layout': 'soa', 'cols': _to_columns(results[0] + results[1])})
+        )
+
+    def _h_updates(self, message):
+        self._executor.submit(lambda: self._queue_to_js(
+            {'response': 'updatePackages', 'layout': 'soa', 'cols': _to_columns(get_updates())}
+        ))
+
+    def _h_explore(self, message):
+        ts, data = self._explore_cache
+        if data is not None and time.monotonic() - ts < EXPLORE_CACHE_TTL:
+            self._queue_to_js({'response': 'explorePackages', 'data': data})
+            return
+
+        def fetch():
+            data = get_explore_packages()
+            self._explore_cache = (time.monotonic(), data)
+            self._queue_to_js({'response': 'explorePackages', 'data': data})
+        self._executor.submit(fetch)
+
+    def _h_details(self, message):
+        name = _js_prop(message, 'name')
+        if not name:
+            return
+        self._executor.submit(lambda: self._queue_to_js(
+            {'response': 'packageDetails', 'name': name, 'details': get_package_details(name)}
+        ))
+
+    def _h_search(self, message):
+        term = _js_prop(message, 'term', '')
+        scope = _js_prop(message, 'scope', 'installed')
+        # The frontend only sends a search on Enter, so start it right away
+        self.start_search(term, scope)
+
+    def _h_install_uninstall(self, message):
+        # JSCValues must not be touched from worker threads, so copy the fields we use now
+        pkg_value = message.object_get_property('package')
+        pkg = {key: _js_prop(pkg_value, key) for key in ('name', 'source', 'raw_name')}
+        is_install = (_js_prop(message, 'command') == 'install')
+        self._executor.submit(self.run_install_uninstall, pkg, is_install)
+
+    def _h_log(self, message):
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("JS LOG: %s", _js_prop(message, 'message'))
+
+    def _when_all_done(self, futures, callback):
+        """
+        Calls callback with the list of results once every future has finished.
+        Nothing blocks while waiting, so no pool worker is tied up.
+        """
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def on_done(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            callback([f.result() for f in futures])
+
+        for future in futures:
+            future.add_done_callback(on_done)
+
+    def start_search(self, term, scope):
+        """
+        Submits the search to the worker pool, superseding any search still in flight.
+        A previous search that has not started yet is cancelled, so it never spawns subprocesses.
+        """
+        if self._search_future is not None:
+            self._search_future.cancel() # No-op once it is running; its results are dropped instead
+        self._search_generation += 1
+        self._search_future = self._executor.submit(self.run_search, term, scope, self._search_generation)
+
+    def run_search(self, term, scope, generation):
         """
         Runs the search operation in a background thread and sends results back to JS.
+        Results are dropped if a newer search has started in the meantime.
         """
-        GLib.idle_add(self.send_to_js, {'response': 'operationStatus', 'status': f"Searching for '{term}'..."})
+        queue = self._queue_to_js
+        queue({'response': 'operationStatus', 'status': f"Searching for '{term}'..."})
         results = search_packages(term, scope)
-        GLib.idle_add(self.send_to_js, {'response': 'searchResults', 'data': results})
-        GLib.idle_add(self.send_to_js, {'response': 'operationStatus', 'status': ""})
+        if generation != self._search_generation:
+            return
+        queue({'response': 'searchResults', 'data': results})
+        queue({'response': 'operationStatus', 'status': ""})
 
     def run_install_uninstall(self, pkg, is_install):
         """
         Executes install/uninstall commands in a background thread.
         Sends status updates and completion messages back to the JS frontend.
         """
-        operation_name = 'install' if is_install else 'uninstall'
-        pkg_id = pkg.get('raw_name') if pkg.get('source') == 'flatpak' and pkg.get('raw_name') else pkg.get('name')
+        queue = self._queue_to_js
+        raw = pkg.get('raw_name')
+        pkg_id = raw if (pkg.get('source') == 'flatpak' and raw) else pkg.get('name')
         
-        result = ""
         if is_install:
-            result = install_package_app_store(pkg, self.send_to_js) # Use app store specific install
+            result = install_package_app_store(pkg, queue) # Use app store specific install
         else:
-            result = uninstall_package_app_store(pkg, self.send_to_js) # Use app store specific uninstall
+            result = uninstall_package_app_store(pkg, queue) # Use app store specific uninstall
 
-        success = "Error:" not in result 
-        
-        GLib.idle_add(self.send_to_js, {
+        queue({
             'response': 'operationCompleted',
             'id': pkg_id,
-            'success': success,
-            'message': result
+            'success': result['ok'],
+            'message': result['message']
         })
         
         # After operation, trigger a full UI refresh in JS
-        GLib.idle_add(self.send_to_js, {'response': 'refresh'})
+        queue({'response': 'refresh'})
 
-    def send_to_js(self, obj):
+    def _queue_to_js(self, obj):
         """
-        Sends a Python dictionary (converted to JSON string) to the JavaScript frontend.
+        Queues a message for the JavaScript frontend. Safe to call from any thread.
+        The first message after a quiet period is flushed on the next idle tick; during a
+        burst, flushes are spaced FLUSH_INTERVAL_MS apart so each one carries a full batch.
         """
-        try:
-            js_code = f'window.appstoreReceive({json.dumps(obj)});'
-            self.webview.run_javascript(js_code)
-        except Exception as e:
-            print(f"Error sending message to JS: {e}")
+        with self._pending_lock:
+            self._pending.append(obj)
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+            in_burst = time.monotonic() - self._last_flush < FLUSH_INTERVAL_MS / 1000
+        if in_burst:
+            GLib.timeout_add(FLUSH_INTERVAL_MS, self._flush_js)
+        else:
+            GLib.idle_add(self._flush_js)
+
+    def _flush_js(self):
+        """
+        Sends all queued messages to the JavaScript frontend with a single run_javascript call,
+        passing the JSON as a string literal for JSON.parse.
+        """
+        with self._pending_lock:
+            if not self._js_ready:
+                # Keep the flush marked as scheduled; _on_load_changed flushes once ready
+                return GLib.SOURCE_REMOVE
+            batch, self._pending = self._pending, []
+            self._flush_scheduled = False
+            self._last_flush = time.monotonic()
+        if batch:
+            try:
+                self.webview.run_javascript(_js_call('window.__recvBatch', batch))
+            except Exception as e:
+                print(f"Error sending messages to JS: {e}")
+        return GLib.SOURCE_REMOVE
+
+    def _on_load_changed(self, webview, load_event):
+        """
+        Tracks whether the page's JS entry points exist, and delivers messages queued while loading.
+        """
+        if load_event == WebKit2.LoadEvent.STARTED:
+            self._js_ready = False
+        elif load_event == WebKit2.LoadEvent.FINISHED:
+            self._js_ready = True
+            self._flush_js()
@@ -0,0 +1,36 @@
+import gi
+gi.require_version('Gtk', '3.0')
+from gi.repository import Gtk
+
+# --- GTK Dialog Helper Functions (for initial prompts) ---
+def show_message_dialog(message, dialog_type=Gtk.MessageType.INFO):
+    """
+    Displays a GTK message dialog.
+    """
+    # Parent is None here as this is used before the main AppStoreWindow is created
+    dialog = Gtk.MessageDialog(
+        parent=None,
+        flags=0,
+        message_type=dialog_type,
+        buttons=Gtk.ButtonsType.OK,
+        text=message
+    )
+    dialog.run()
+    dialog.destroy()
+
+def show_confirmation_dialog(message):
+    """
+    Displays a GTK confirmation dialog (Yes/No).
+    Returns True if 'Yes' is clicked, False otherwise.
+    """
+    # Parent is None here as this is used before the main AppStoreWindow is created
+    dialog = Gtk.MessageDialog(
+        parent=None,
+        flags=0,
+        message_type=Gtk.MessageType.QUESTION,
+        buttons=Gtk.ButtonsType.YES_NO,
+        text=message
+    )
+    response = dialog.run()
+    dialog.destroy()
+    return (response == Gtk.ResponseType.YES)
@@ -1,42 +1,19 @@
-import gi
-gi.require_version('Gtk', '3.0')
-from gi.repository import Gtk
+import os
+import json
+import time
+import functools
+import tempfile
+import types
 
-# --- GTK Dialog Helper Functions (for initial prompts) ---
-def show_message_dialog(message, dialog_type=Gtk.MessageType.INFO):
-    """
-    Displays a GTK message dialog.
-    """
-    # Parent is None here as this is used before the main AppStoreWindow is created
-    dialog = Gtk.MessageDialog(
-        parent=None,
-        flags=0,
-        message_type=dialog_type,
-        buttons=Gtk.ButtonsType.OK,
-        text=message
-    )
-    dialog.run()
-    dialog.destroy()
-
-def show_confirmation_dialog(message):
-    """
-    Displays a GTK confirmation dialog (Yes/No).
-    Returns True if 'Yes' is clicked, False otherwise.
-    """
-    # Parent is None here as this is used before the main AppStoreWindow is created
-    dialog = Gtk.MessageDialog(
-        parent=None,
-        flags=0,
-        message_type=Gtk.MessageType.QUESTION,
-        buttons=Gtk.ButtonsType.YES_NO,
-        text=message
-    )
-    response = dialog.run()
-    dialog.destroy()
-    return (response == Gtk.ResponseType.YES)
+try:
+    import orjson
+except ImportError: # Optional speedup; fall back to the standard library
+    orjson = None
+
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "linux-software-store")
 
 # --- Mock Icon Data and Function ---
-ICON_MAP = {
+_ICONS = {
     'vim': 'fas fa-terminal',
     'firefox': 'fas fa-globe',
     'gimp': 'fas fa-paint-brush',
@@ -50,9 +27,92 @@ ICON_MAP = {
     'spotify': 'fab fa-spotify',
     'libreoffice': 'fas fa-file-alt',
 }
+# Exported read-only; lookups go straight to the underlying dict
+ICON_MAP = types.MappingProxyType(_ICONS)
+_icon_get = _ICONS.get
 
+@functools.lru_cache(maxsize=4096)
 def get_package_icon(pkg_name):
     """
     Returns a Font Awesome icon class or a default icon for a given package name.
     """
-    return ICON_MAP.get(pkg_name.lower(), 'fas fa-cube')
+    # Most package names are already lowercase; skip the copy for those
+    key = pkg_name if pkg_name.islower() else pkg_name.lower()
+    return _icon_get(key, 'fas fa-cube')
+
+# --- JSON Serialization ---
+def json_dumps(obj):
+    """
+    Serializes obj to a JSON string, using orjson when it is installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj).decode('utf-8')
+    return json.dumps(obj)
+
+# --- On-disk Result Cache ---
+def _stat_key(paths):
+    key = []
+    for path in paths:
+        try:
+            key.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            key.append(None)
+    return key
+
+def mtime_cached(*paths, ttl=None):
+    """
+    Caches a function's (JSON-serializable) result on disk, keyed by the mtimes of `paths`.
+    The cached result is reused until any of the paths change, or until `ttl` seconds
+    have passed if given. `~` is expanded. A result of None marks a failed call and is
+    returned without being cached.
+    """
+    paths = tuple(os.path.expanduser(p) for p in paths)
+
+    def decorator(func):
+        cache_file = os.path.join(CACHE_DIR, f"{func.__name__}.json")
+        memo = {}
+
+        def is_fresh(entry, key):
+            if entry.get('key') != key:
+                return False
+            return ttl is None or time.time() - entry.get('time', 0) < ttl
+
+        @functools.wraps(func)
+        def wrapper():
+            key = _stat_key(paths)
+            if all(k is None for k in key):
+                return func()
+
+            if is_fresh(memo, key):
+                return memo['data']
+            try:
+                with open(cache_file, 'r', encoding='utf-8') as f:
+                    cached = json.load(f)
+                if is_fresh(cached, key):
+                    memo.update(cached)
+                    return cached['data']
+            except (OSError, ValueError):
+                pass
+
+            data = func()
+            # Without a TTL an empty (possibly failed) result could be reused indefinitely
+            if data is not None and (data or ttl is not None):
+                entry = {'key': key, 'time': time.time(), 'data': data}
+                memo.update(entry)
+                try:
+                    os.makedirs(CACHE_DIR, exist_ok=True)
+                    # Write a private temp file and rename it into place, so a crash or a
+                    # concurrent call never leaves a truncated cache file behind
+                    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, prefix=f".{func.__name__}.", suffix=".tmp")
+                    try:
+                        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                            json.dump(entry, f)
+                        os.replace(tmp_path, cache_file)
+                    except BaseException:
+                        os.unlink(tmp_path)
+                        raise
+                except OSError as e:
+                    print(f"Warning: Could not write cache file {cache_file}: {e}")
+            return data
+        return wrapper
+    return decorator
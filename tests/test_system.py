@@ -0,0 +1,63 @@
+import os
+import sys
+import time
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from core.system import run_cmd_stream
+
+
+class RunCmdStreamOrderTest(unittest.TestCase):
+    def run_and_queue_completion(self, script):
+        """
+        Mirrors AppStoreWindow.run_install_uninstall: progress goes through the callback,
+        then the completion messages are queued on the same thread once the command returns.
+        """
+        queued = []
+        lock = threading.Lock()
+
+        def queue(obj):
+            with lock:
+                queued.append(obj)
+
+        result = run_cmd_stream(['sh', '-c', script], 'pkg', 'install', 'pkg', queue)
+        queue({'response': 'operationCompleted', 'id': 'pkg', 'success': result['ok']})
+        queue({'response': 'refresh'})
+        # Give any stray trailing flush a chance to land after the completion messages
+        time.sleep(0.1)
+        with lock:
+            return result, [msg['response'] for msg in queued], queued
+
+    def assert_progress_before_completion(self, responses):
+        completed = responses.index('operationCompleted')
+        self.assertEqual(responses[completed:], ['operationCompleted', 'refresh'])
+        self.assertTrue(all(r == 'operationProgress' for r in responses[:completed]))
+
+    def test_failed_command_progress_precedes_completion(self):
+        result, responses, queued = self.run_and_queue_completion('echo "error: boom" >&2; exit 1')
+        self.assertFalse(result['ok'])
+        self.assert_progress_before_completion(responses)
+        self.assertTrue(queued[responses.index('operationCompleted') - 1]['status'].startswith("Error:"))
+
+    def test_error_text_does_not_override_exit_code(self):
+        result, responses, queued = self.run_and_queue_completion('echo "error: failed to synchronize mirror" >&2; exit 0')
+        self.assertTrue(result['ok'])
+        self.assertEqual(queued[responses.index('operationCompleted') - 1]['status'], "Completed")
+
+    def test_silent_failure_reports_exit_code(self):
+        result, responses, queued = self.run_and_queue_completion('exit 3')
+        self.assertFalse(result['ok'])
+        self.assertEqual(queued[responses.index('operationCompleted') - 1]['status'], "Error: exit code 3")
+
+    def test_held_back_progress_precedes_completion(self):
+        # Lines closer together than the progress interval are coalesced, not dropped
+        result, responses, queued = self.run_and_queue_completion('echo first; echo second; echo third')
+        self.assertTrue(result['ok'])
+        self.assert_progress_before_completion(responses)
+        self.assertEqual(queued[responses.index('operationCompleted') - 1]['status'], "Completed")
+
+
+if __name__ == "__main__":
+    unittest.main()